@@ -9,19 +9,131 @@ Polls Owlet cloud and upserts normalized snapshots into
 from __future__ import annotations
 
 import asyncio
-import json
+import hashlib
 import logging
 import os
+import random
+import socket
 import time
 import uuid
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
-
-import requests
+from dataclasses import dataclass
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import httpx
+import orjson
 from pyowletapi.api import OwletAPI
+from pyowletapi.exceptions import OwletAuthenticationError, OwletError
 
 DEFAULT_CHILD_ID = "00000000-0000-0000-0000-000000000001"
 UPSERT_ENDPOINT = "/rest/v1/owlet_readings?on_conflict=id"
+# Upper bound on unsent rows kept across failed flushes.
+MAX_PENDING_ROWS = 1000
+# 4xx responses worth re-sending the batch for: timeouts, rate limiting and
+# key/config errors that are fixed outside the bridge. Other 4xx mean
+# PostgREST rejected the rows themselves.
+RETRYABLE_STATUS_CODES = frozenset((401, 403, 408, 429))
+# Retry delays after a failed poll: 3s, 6s, 12s, ... capped, plus jitter.
+BACKOFF_BASE_SECONDS = 3
+BACKOFF_MAX_SECONDS = 60
+# How long an idle pooled Supabase connection is kept. httpx's 5s default is
+# shorter than the poll interval, which meant a new handshake on every POST.
+SUPABASE_KEEPALIVE_SECONDS = 300
+# Refresh the Owlet token this long before pyowletapi reports it expiring.
+OWLET_REFRESH_MARGIN_SECONDS = 60
+
+_NS_URL_BYTES = uuid.NAMESPACE_URL.bytes
+# orjson's integer range: signed 64-bit minimum to unsigned 64-bit maximum.
+_JSON_INT_MIN = -(2**63)
+_JSON_INT_MAX = 2**64 - 1
+
+_TRUE_STR = frozenset(("1", "true", "yes", "on"))
+_FALSE_STR = frozenset(("0", "false", "no", "off"))
+
+# (sock off, movement <= 0) -> sleepState; movement is None when unreported.
+_SLEEP_STATES = {
+    (True, None): "unknown",
+    (True, True): "unknown",
+    (True, False): "unknown",
+    (False, None): "unknown",
+    (False, True): "asleep",
+    (False, False): "awake",
+}
+
+# Property keys tried per field, in priority order. The REAL_TIME_VITALS key
+# is checked right after the first (v3) property name.
+_HR_KEYS = ("heart_rate", "HEART_RATE", "hr")
+_OX_KEYS = ("oxygen_saturation", "OXYGEN_LEVEL", "ox")
+_MOVEMENT_KEYS = ("movement", "MOVEMENT", "mv")
+_SOCK_CONN_KEYS = ("sock_connection", "SOCK_CONNECTION", "sc")
+_BATTERY_KEYS = ("battery_percentage", "BATT_LEVEL", "bat")
+_SOCK_OFF_KEYS = ("sock_off", "SOCK_OFF")
+# v3 name first, then the v2 fallback.
+_TS_KEYS = ("data_updated_at", "TIMESTAMP")
+_RT_VITALS_KEY = "REAL_TIME_VITALS"
+# Whichever of _TS_KEYS last carried the timestamp; see recorded_at_ms.
+_ts_key: Optional[str] = None
+
+# Every property build_row reads a value from.
+_KNOWN_KEYS = frozenset(
+    _HR_KEYS
+    + _OX_KEYS
+    + _MOVEMENT_KEYS
+    + _SOCK_CONN_KEYS
+    + _BATTERY_KEYS
+    + _SOCK_OFF_KEYS
+    + _TS_KEYS
+    + (_RT_VITALS_KEY,)
+)
+
+
+class SupabaseError(RuntimeError):
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        permanent: bool = False,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+    @property
+    def retryable(self) -> bool:
+        if self.permanent:
+            return False
+        code = self.status_code
+        return code is None or code >= 500 or code in RETRYABLE_STATUS_CODES
+
+
+@dataclass(slots=True)
+class ReadingRow:
+    # Attribute names are the owlet_readings column names.
+    id: str
+    childId: str
+    recordedAt: int
+    heartRateBpm: Optional[int]
+    oxygenSaturationPct: Optional[float]
+    movementLevel: Optional[float]
+    sleepState: str
+    sockConnected: Optional[bool]
+    batteryPct: Optional[float]
+    sourceDeviceId: str
+    sourceSessionId: str
+    rawPayload: Dict[str, Any]
+    createdAt: int
+    updatedAt: int
+    syncStatus: str = "synced"
+    _deleted: bool = False
+
+    def to_json(self) -> Dict[str, Any]:
+        # orjson's native dataclass support skips underscore-prefixed
+        # attributes, which would drop `_deleted` from the upsert.
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 def env_required(name: str) -> str:
@@ -38,15 +150,16 @@ def env_int(name: str, default: int) -> int:
     return int(value)
 
 
-def get_prop_value(props: Dict[str, Any], key: str) -> Any:
-    item = props.get(key)
-    if item is None:
-        return None
-    if isinstance(item, dict):
-        if "value" in item:
-            return item.get("value")
-        return item
-    return getattr(item, "value", item)
+def _first_present(fields: Dict[str, Any], rt_vitals: Dict[str, Any], keys: tuple, rt_key: str) -> Any:
+    # Same result as chaining the lookups with `or`.
+    value = fields.get(keys[0]) or rt_vitals.get(rt_key)
+    if value:
+        return value
+    for key in keys[1:]:
+        value = fields.get(key)
+        if value:
+            return value
+    return value
 
 
 def as_float(value: Any) -> Optional[float]:
@@ -68,136 +181,154 @@ def as_int(value: Any) -> Optional[int]:
 
 
 def as_bool(value: Any) -> Optional[bool]:
+    if value is True or value is False:
+        return value
     if value is None or value == "":
         return None
-    if isinstance(value, bool):
-        return value
     if isinstance(value, (int, float)):
         return value != 0
     if isinstance(value, str):
         lowered = value.strip().lower()
-        if lowered in ("1", "true", "yes", "on"):
+        if lowered in _TRUE_STR:
             return True
-        if lowered in ("0", "false", "no", "off"):
+        if lowered in _FALSE_STR:
             return False
     return None
 
 
 def normalize_sleep_state(sock_off: Any, movement: Any) -> str:
-    sock_off_bool = as_bool(sock_off)
     movement_num = as_float(movement)
+    still = None if movement_num is None else movement_num <= 0
+    return _SLEEP_STATES[as_bool(sock_off) is True, still]
 
-    if sock_off_bool:
-        return "unknown"
-    if movement_num is None:
-        return "unknown"
-    if movement_num <= 0:
-        return "asleep"
-    return "awake"
 
-
-def safe_raw_payload(props: Dict[str, Any]) -> Dict[str, Any]:
-    data: Dict[str, Any] = {}
-    for key, item in props.items():
-        value = item.get("value") if isinstance(item, dict) else getattr(item, "value", item)
+def _is_json_scalar(value: Any) -> bool:
+    # Mirrors what orjson accepts: ints must fit in 64 bits and strings must
+    # be valid UTF-8 (no lone surrogates).
+    if value is None or isinstance(value, (bool, float)):
+        return True
+    if isinstance(value, int):
+        return _JSON_INT_MIN <= value <= _JSON_INT_MAX
+    if isinstance(value, str):
+        if value.isascii():
+            return True
         try:
-            json.dumps(value)
-            data[key] = value
-        except TypeError:
-            data[key] = str(value)
-    return data
+            value.encode("utf-8")
+        except UnicodeEncodeError:
+            return False
+        return True
+    return False
+
+
+def _is_jsonable(value: Any) -> bool:
+    if _is_json_scalar(value):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_jsonable(item) for item in value)
+    if isinstance(value, dict):
+        return all(_is_json_scalar(key) and _is_jsonable(item) for key, item in value.items())
+    return False
 
 
-def parse_realtime_vitals(props: Dict[str, Any]) -> Dict[str, Any]:
-    raw = get_prop_value(props, "REAL_TIME_VITALS")
+def extract_props(props: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Unwrap Owlet properties in one pass.
+
+    Returns the values of the properties build_row reads, keyed by property
+    name, and the JSON-safe raw payload of every property.
+    """
+    fields: Dict[str, Any] = {}
+    raw: Dict[str, Any] = {}
+    for key, item in props.items():
+        if isinstance(item, dict):
+            value = item.get("value")
+            if key in _KNOWN_KEYS:
+                fields[key] = value if "value" in item else item
+        else:
+            value = getattr(item, "value", item)
+            if key in _KNOWN_KEYS:
+                fields[key] = value
+        raw[key] = value if _is_jsonable(value) else str(value)
+    return fields, raw
+
+
+def parse_realtime_vitals(fields: Dict[str, Any]) -> Dict[str, Any]:
+    raw = fields.get(_RT_VITALS_KEY)
     if isinstance(raw, str):
         try:
-            parsed = json.loads(raw)
+            parsed = orjson.loads(raw)
             if isinstance(parsed, dict):
                 return parsed
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             return {}
     if isinstance(raw, dict):
         return raw
     return {}
 
 
-def recorded_at_ms(props: Dict[str, Any]) -> int:
-    # pyowletapi v3 field
-    ts = get_prop_value(props, "data_updated_at")
-    parsed = as_float(ts)
+def recorded_at_ms(fields: Dict[str, Any]) -> int:
+    # The timestamp key depends on the device's API version (v3
+    # data_updated_at, v2 TIMESTAMP), so remember which one answered and
+    # read it directly on later polls.
+    global _ts_key
+    parsed = as_float(fields.get(_ts_key)) if _ts_key is not None else None
     if parsed is None:
-        # v2 fallback
-        ts2 = get_prop_value(props, "TIMESTAMP")
-        parsed = as_float(ts2)
+        for key in _TS_KEYS:
+            parsed = as_float(fields.get(key))
+            if parsed is not None:
+                _ts_key = key
+                break
     if parsed is None:
         return int(time.time() * 1000)
 
     # if seconds -> ms
     if parsed < 10_000_000_000:
-        return int(parsed * 1000)
+        return int(parsed * 1000.0)
     return int(parsed)
 
 
-def build_row(child_id: str, dsn: str, props: Dict[str, Any]) -> Dict[str, Any]:
-    rt_vitals = parse_realtime_vitals(props)
+def row_uuid(name: str) -> str:
+    # Same string as str(uuid.uuid5(uuid.NAMESPACE_URL, name)), so ids match
+    # rows already written, without building the intermediate UUID object.
+    digest = bytearray(hashlib.sha1(_NS_URL_BYTES + name.encode()).digest()[:16])
+    digest[6] = (digest[6] & 0x0F) | 0x50
+    digest[8] = (digest[8] & 0x3F) | 0x80
+    h = digest.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
 
-    hr = as_int(
-        get_prop_value(props, "heart_rate")
-        or rt_vitals.get("hr")
-        or get_prop_value(props, "HEART_RATE")
-        or get_prop_value(props, "hr")
-    )
-    ox = as_float(
-        get_prop_value(props, "oxygen_saturation")
-        or rt_vitals.get("ox")
-        or get_prop_value(props, "OXYGEN_LEVEL")
-        or get_prop_value(props, "ox")
-    )
-    movement = as_float(
-        get_prop_value(props, "movement")
-        or rt_vitals.get("mv")
-        or get_prop_value(props, "MOVEMENT")
-        or get_prop_value(props, "mv")
-    )
-    sock_conn = as_bool(
-        get_prop_value(props, "sock_connection")
-        or rt_vitals.get("sc")
-        or get_prop_value(props, "SOCK_CONNECTION")
-        or get_prop_value(props, "sc")
-    )
-    battery = as_float(
-        get_prop_value(props, "battery_percentage")
-        or rt_vitals.get("bat")
-        or get_prop_value(props, "BATT_LEVEL")
-        or get_prop_value(props, "bat")
-    )
 
-    ts_ms = recorded_at_ms(props)
+def build_row(child_id: str, dsn: str, props: Dict[str, Any]) -> ReadingRow:
+    fields, raw_payload = extract_props(props)
+    rt_vitals = parse_realtime_vitals(fields)
+
+    hr = as_int(_first_present(fields, rt_vitals, _HR_KEYS, "hr"))
+    ox = as_float(_first_present(fields, rt_vitals, _OX_KEYS, "ox"))
+    movement = as_float(_first_present(fields, rt_vitals, _MOVEMENT_KEYS, "mv"))
+    sock_conn = as_bool(_first_present(fields, rt_vitals, _SOCK_CONN_KEYS, "sc"))
+    battery = as_float(_first_present(fields, rt_vitals, _BATTERY_KEYS, "bat"))
+
+    ts_ms = recorded_at_ms(fields)
     source_session_id = f"{dsn}:{ts_ms}"
-    record_id = str(uuid.uuid5(uuid.NAMESPACE_URL, source_session_id))
-
-    return {
-        "id": record_id,
-        "childId": child_id,
-        "recordedAt": ts_ms,
-        "heartRateBpm": hr,
-        "oxygenSaturationPct": ox,
-        "movementLevel": movement,
-        "sleepState": normalize_sleep_state(
-            get_prop_value(props, "sock_off") or get_prop_value(props, "SOCK_OFF"),
+    record_id = row_uuid(source_session_id)
+
+    return ReadingRow(
+        id=record_id,
+        childId=child_id,
+        recordedAt=ts_ms,
+        heartRateBpm=hr,
+        oxygenSaturationPct=ox,
+        movementLevel=movement,
+        sleepState=normalize_sleep_state(
+            fields.get("sock_off") or fields.get("SOCK_OFF"),
             movement,
         ),
-        "sockConnected": sock_conn,
-        "batteryPct": battery,
-        "sourceDeviceId": dsn,
-        "sourceSessionId": source_session_id,
-        "rawPayload": safe_raw_payload(props),
-        "createdAt": ts_ms,
-        "updatedAt": ts_ms,
-        "syncStatus": "synced",
-        "_deleted": False,
-    }
+        sockConnected=sock_conn,
+        batteryPct=battery,
+        sourceDeviceId=dsn,
+        sourceSessionId=source_session_id,
+        rawPayload=raw_payload,
+        createdAt=ts_ms,
+        updatedAt=ts_ms,
+    )
 
 
 def supabase_error_hint(status_code: int, response_text: str) -> Optional[str]:
@@ -217,21 +348,112 @@ def supabase_error_hint(status_code: int, response_text: str) -> Optional[str]:
     return None
 
 
-def upsert_row(supabase_url: str, service_role_key: str, row: Dict[str, Any]) -> None:
-    url = f"{supabase_url.rstrip('/')}{UPSERT_ENDPOINT}"
-    headers = {
-        "apikey": service_role_key,
-        "Authorization": f"Bearer {service_role_key}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates,return=minimal",
-    }
-    response = requests.post(url, headers=headers, json=[row], timeout=20)
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delay-seconds or an HTTP date.
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def supabase_headers(service_role_key: str) -> Mapping[str, str]:
+    return MappingProxyType(
+        {
+            "apikey": service_role_key,
+            "Authorization": f"Bearer {service_role_key}",
+            "Content-Type": "application/json",
+            "Prefer": "resolution=merge-duplicates,return=minimal",
+        }
+    )
+
+
+def supabase_socket_options() -> List[Tuple[int, int, int]]:
+    # Send each small upsert immediately (no Nagle delay) and keep the idle
+    # pooled connection alive between polls so NATs don't drop it.
+    options = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 20))
+    return options
+
+
+def make_supabase_client(service_role_key: str) -> httpx.AsyncClient:
+    # One client for the bridge lifetime: the pooled HTTP/2 connection is
+    # reused across polls and writes no longer block the event loop.
+    return httpx.AsyncClient(
+        timeout=20,
+        headers=supabase_headers(service_role_key),
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(
+                max_connections=4,
+                max_keepalive_connections=1,
+                keepalive_expiry=SUPABASE_KEEPALIVE_SECONDS,
+            ),
+            socket_options=supabase_socket_options(),
+        ),
+    )
+
+
+def supabase_upsert_url(supabase_url: str) -> httpx.URL:
+    return httpx.URL(f"{supabase_url.rstrip('/')}{UPSERT_ENDPOINT}")
+
+
+async def upsert_rows(client: httpx.AsyncClient, url: httpx.URL, rows: List[ReadingRow]) -> None:
+    try:
+        body = orjson.dumps(
+            rows,
+            default=ReadingRow.to_json,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS,
+        )
+    except orjson.JSONEncodeError as exc:
+        # Re-encoding the same rows would fail the same way, so the batch
+        # must not be retried.
+        raise SupabaseError(f"Supabase upsert body not encodable: {exc}", permanent=True) from exc
+    try:
+        response = await client.post(url, content=body)
+    except httpx.HTTPError as exc:
+        # Network-level failure (timeout, refused, protocol error): still a
+        # Supabase problem, so it must not trigger an Owlet re-auth.
+        raise SupabaseError(f"Supabase upsert failed: {exc!r}", status_code=None) from exc
     if response.status_code >= 400:
-        body = response.text[:400]
+        detail = response.text[:400]
         hint = supabase_error_hint(response.status_code, response.text)
+        message = f"Supabase upsert failed ({response.status_code}): {detail}"
         if hint:
-            raise RuntimeError(f"Supabase upsert failed ({response.status_code}): {body} | Hint: {hint}")
-        raise RuntimeError(f"Supabase upsert failed ({response.status_code}): {body}")
+            message = f"{message} | Hint: {hint}"
+        raise SupabaseError(
+            message,
+            response.status_code,
+            parse_retry_after(response.headers.get("Retry-After")),
+        )
+
+
+def backoff_delay(attempt: int) -> float:
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** min(attempt, 10))
+    return delay + random.uniform(0, 1)
+
+
+def trim_pending(pending: Dict[str, ReadingRow]) -> None:
+    if len(pending) <= MAX_PENDING_ROWS:
+        return
+    dropped = len(pending) - MAX_PENDING_ROWS
+    for key in list(pending)[:dropped]:
+        del pending[key]
+    logging.warning("Dropped %s oldest unsent rows (pending cap %s)", dropped, MAX_PENDING_ROWS)
 
 
 async def choose_device_dsn(api: OwletAPI, configured_dsn: Optional[str]) -> str:
@@ -250,6 +472,28 @@ async def choose_device_dsn(api: OwletAPI, configured_dsn: Optional[str]) -> str
     return str(response_devices[0].get("device", {}).get("dsn", ""))
 
 
+async def refresh_owlet_session(api: OwletAPI, region: str, user: str, password: str) -> OwletAPI:
+    """Refresh the Owlet token, falling back to a full password login.
+
+    Returns the API object to keep using: `api` itself after a refresh, or a
+    newly logged-in replacement if the refresh token was rejected.
+    """
+    try:
+        await api.refresh_authentication()
+        return api
+    except OwletError as exc:
+        logging.warning("Owlet token refresh failed (%s); logging in again", exc)
+
+    new_api = OwletAPI(region=region, user=user, password=password)
+    try:
+        await new_api.authenticate()
+    except Exception:
+        await new_api.close()
+        raise
+    await api.close()
+    return new_api
+
+
 async def run_bridge() -> None:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
@@ -260,10 +504,22 @@ async def run_bridge() -> None:
 
     child_id = os.getenv("TOMBSTONE_CHILD_ID", DEFAULT_CHILD_ID).strip() or DEFAULT_CHILD_ID
     poll_seconds = env_int("OWLET_POLL_SECONDS", 30)
+    batch_size = max(1, env_int("OWLET_BATCH_SIZE", 1))
+    batch_max_seconds = max(0, env_int("OWLET_BATCH_MAX_SECONDS", 60))
     configured_dsn = os.getenv("OWLET_DEVICE_DSN", "").strip() or None
     owlet_region = os.getenv("OWLET_REGION", "world").strip().lower() or "world"
 
     api = OwletAPI(region=owlet_region, user=owlet_email, password=owlet_password)
+    client = make_supabase_client(supabase_service_role_key)
+    upsert_url = supabase_upsert_url(supabase_url)
+    # Keyed by row id so repeated polls of the same sample collapse into one
+    # row; Postgres rejects an upsert batch that touches the same id twice.
+    pending: Dict[str, ReadingRow] = {}
+    pending_since = 0.0
+    # Earliest monotonic time the next flush may run after a failed one.
+    flush_after = 0.0
+    flush_failures = 0
+    last_reading: Optional[tuple] = None
 
     try:
         await api.authenticate()
@@ -271,34 +527,144 @@ async def run_bridge() -> None:
         dsn = await choose_device_dsn(api, configured_dsn)
         logging.info("Owlet device selected: %s", dsn)
 
+        # Poll against a fixed schedule so the time spent polling and writing
+        # does not stretch the period. `clock` (the event loop's monotonic
+        # clock) drives both the tick schedule and the batch/flush timers. The
+        # loop runs for the life of the process, so the names it calls on
+        # every poll are bound to locals.
+        clock = asyncio.get_running_loop().time
+        sleep = asyncio.sleep
+        wall_time = time.time
+        root_logger = logging.getLogger()
+        poll_interval = max(5, poll_seconds)
+        next_tick = clock()
+        failures = 0
         while True:
+            next_tick += poll_interval
+            flushing = False
+            refreshing = False
             try:
+                expiry = api.tokens.get("expiry")
+                if expiry is not None and expiry - wall_time() <= OWLET_REFRESH_MARGIN_SECONDS:
+                    refreshing = True
+                    api = await refresh_owlet_session(api, owlet_region, owlet_email, owlet_password)
+                    refreshing = False
                 response = await api.get_properties(dsn)
                 props = response.get("response", {})
                 row = build_row(child_id, dsn, props)
-                upsert_row(supabase_url, supabase_service_role_key, row)
-
-                iso = datetime.fromtimestamp(row["recordedAt"] / 1000, tz=timezone.utc).isoformat()
-                logging.info(
-                    "Upserted %s HR=%s O2=%s movement=%s sock=%s",
-                    iso,
-                    row["heartRateBpm"],
-                    row["oxygenSaturationPct"],
-                    row["movementLevel"],
-                    row["sockConnected"],
+                # Between sock reports Owlet returns the same sample; only queue
+                # a row when the timestamp or a reported value has moved.
+                reading = (
+                    row.recordedAt,
+                    row.heartRateBpm,
+                    row.oxygenSaturationPct,
+                    row.movementLevel,
+                    row.sleepState,
+                    row.sockConnected,
+                    row.batteryPct,
                 )
+                if reading == last_reading:
+                    logging.debug("Skipping unchanged reading at %s", row.recordedAt)
+                else:
+                    last_reading = reading
+                    if not pending:
+                        pending_since = clock()
+                    pending[row.id] = row
+
+                if (
+                    pending
+                    and clock() >= flush_after
+                    and (len(pending) >= batch_size or clock() - pending_since >= batch_max_seconds)
+                ):
+                    flushing = True
+                    await upsert_rows(client, upsert_url, list(pending.values()))
+                    flushing = False
+                    count = len(pending)
+                    pending.clear()
+                    flush_failures = 0
+
+                    if root_logger.isEnabledFor(logging.INFO):
+                        iso = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(row.recordedAt // 1000))
+                        logging.info(
+                            "Upserted %s HR=%s O2=%s movement=%s sock=%s rows=%s",
+                            iso,
+                            row.heartRateBpm,
+                            row.oxygenSaturationPct,
+                            row.movementLevel,
+                            row.sockConnected,
+                            count,
+                        )
+                failures = 0
+            except SupabaseError as exc:
+                if exc.retryable:
+                    # Supabase-side failure: the Owlet session is fine, so keep
+                    # polling on schedule and only hold back the next flush.
+                    if exc.retry_after is not None:
+                        delay = min(exc.retry_after, BACKOFF_MAX_SECONDS)
+                    else:
+                        delay = backoff_delay(flush_failures)
+                    flush_failures += 1
+                    flush_after = clock() + delay
+                    logging.error("%s (retrying in %.0fs)", exc, delay)
+                    trim_pending(pending)
+                else:
+                    # PostgREST rejected the rows; re-sending them would fail
+                    # the same way and block every row queued behind them.
+                    logging.error("%s (dropping %s rows)", exc, len(pending))
+                    pending.clear()
+            except OwletAuthenticationError as exc:
+                # Try the cheap token refresh before a full password login.
+                logging.warning("Owlet authentication error: %s", exc)
+                delay = backoff_delay(failures)
+                failures += 1
+                next_tick = clock() + delay
+                trim_pending(pending)
+                if refreshing:
+                    # The refresh helper itself failed, password fallback
+                    # included; retrying now would only add login attempts
+                    # towards an Owlet lockout. The next tick retries it.
+                    logging.warning("Owlet re-auth failed; retrying in %.0fs", delay)
+                else:
+                    try:
+                        api = await refresh_owlet_session(api, owlet_region, owlet_email, owlet_password)
+                        logging.info("Refreshed Owlet authentication after error")
+                    except Exception as relogin_exc:
+                        logging.exception("Owlet re-auth failed: %s", relogin_exc)
             except Exception as exc:
-                logging.exception("Bridge loop error: %s", exc)
-                try:
-                    await api.authenticate()
-                    dsn = await choose_device_dsn(api, configured_dsn)
-                    logging.info("Re-authenticated with Owlet after error")
-                except Exception as relogin_exc:
-                    logging.exception("Owlet re-auth failed: %s", relogin_exc)
-
-            await asyncio.sleep(max(5, poll_seconds))
+                if flushing:
+                    # Only a retryable SupabaseError keeps the batch; anything
+                    # else would fail again on every resend, and it is not an
+                    # Owlet problem, so skip the re-auth too.
+                    logging.exception("Supabase flush failed: %s (dropping %s rows)", exc, len(pending))
+                    pending.clear()
+                elif refreshing:
+                    logging.exception("Owlet token refresh failed: %s", exc)
+                    delay = backoff_delay(failures)
+                    failures += 1
+                    next_tick = clock() + delay
+                    trim_pending(pending)
+                else:
+                    logging.exception("Bridge loop error: %s", exc)
+                    delay = backoff_delay(failures)
+                    failures += 1
+                    next_tick = clock() + delay
+                    trim_pending(pending)
+                    try:
+                        await api.authenticate()
+                        dsn = await choose_device_dsn(api, configured_dsn)
+                        logging.info("Re-authenticated with Owlet after error")
+                    except Exception as relogin_exc:
+                        logging.exception("Owlet re-auth failed: %s", relogin_exc)
+
+            now = clock()
+            if next_tick < now:
+                # A poll overran its slot; start the next one now rather
+                # than firing several back-to-back to catch up.
+                next_tick = now
+            await sleep(next_tick - now)
     finally:
         await api.close()
+        await client.aclose()
 
 
 if __name__ == "__main__":